@@ -2,19 +2,306 @@
 Download model artifacts from cloud storage if not present locally
 """
 import os
+import json
+import fcntl
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
-MODEL_PATH = Path(__file__).parent.parent / "models" / "model_artifacts.joblib"
+# Set MODEL_CACHE_DIR to a shared volume so several instances reuse one copy
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "")
+MODEL_PATH = (
+    Path(MODEL_CACHE_DIR) if MODEL_CACHE_DIR else Path(__file__).parent.parent / "models"
+) / "model_artifacts.joblib"
 # Set this via environment variable MODEL_URL
 MODEL_URL = os.getenv("MODEL_URL", "")
+# Optional expected sha256 hex digest of the artifact
+MODEL_SHA256 = os.getenv("MODEL_SHA256", "").lower()
+# Download in 1 MiB chunks; log progress every 50 chunks (~50MB)
+CHUNK_SIZE = 1024 * 1024
+LOG_EVERY_CHUNKS = 50
+# Number of parallel HTTP Range requests used when the server supports them
+DOWNLOAD_WORKERS = int(os.getenv("MODEL_DOWNLOAD_WORKERS", "8"))
+# Attempts per startup; single-stream downloads resume from the partial file
+DOWNLOAD_RETRIES = int(os.getenv("MODEL_DOWNLOAD_RETRIES", "3"))
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 300)
+
+
+def _create_session() -> requests.Session:
+    """Session with connection pooling and retries on transient server errors"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=DOWNLOAD_WORKERS,
+        pool_maxsize=DOWNLOAD_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by all requests so range workers and retries reuse TCP/TLS connections
+_SESSION = _create_session()
+
+
+class RangeNotSupportedError(Exception):
+    """Raised when the server ignores a Range request"""
+
+
+def _part_path() -> Path:
+    """Path of the in-progress download"""
+    return MODEL_PATH.with_name(MODEL_PATH.name + ".part")
+
+
+def _meta_path() -> Path:
+    """Path of the JSON file describing the in-progress download"""
+    return MODEL_PATH.with_name(MODEL_PATH.name + ".part.meta")
+
+
+def _sha_path() -> Path:
+    """Path of the sidecar file holding the verified sha256 of the model"""
+    return MODEL_PATH.with_name(MODEL_PATH.name + ".sha256")
+
+
+def _lock_path() -> Path:
+    """Path of the lock file serializing downloads between processes"""
+    return MODEL_PATH.with_name(MODEL_PATH.name + ".lock")
+
+
+def _file_sha256(path: Path) -> str:
+    """Compute the sha256 hex digest of a file"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _is_model_valid() -> bool:
+    """
+    Check that the local model exists and, if MODEL_SHA256 is set, matches it.
+    The verified digest is cached beside the model so other workers skip hashing.
+    """
+    if not MODEL_PATH.exists():
+        return False
+    if not MODEL_SHA256:
+        return True
+
+    try:
+        if _sha_path().read_text().strip() == MODEL_SHA256:
+            return True
+    except OSError:
+        pass
+
+    if _file_sha256(MODEL_PATH) != MODEL_SHA256:
+        logger.warning(f"Model at {MODEL_PATH} does not match MODEL_SHA256")
+        return False
+
+    _sha_path().write_text(MODEL_SHA256)
+    return True
+
+
+def _resolve_url(url: str) -> str:
+    """Normalize share links so they point at the raw file"""
+    # Support for Dropbox links (add dl=1 parameter)
+    if "dropbox.com" in url and "dl=0" in url:
+        url = url.replace("dl=0", "dl=1")
+    elif "dropbox.com" in url and "dl=" not in url:
+        url = url + ("&" if "?" in url else "?") + "dl=1"
+    return url
+
+
+def _probe(url: str) -> dict:
+    """
+    Inspect the remote file with a HEAD request
+
+    Returns:
+        Dictionary with the final url, size (0 if unknown), etag and
+        whether byte-range requests are supported
+    """
+    remote = {"url": url, "size": 0, "etag": None, "ranges": False}
+    try:
+        response = _SESSION.head(url, allow_redirects=True, timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.info(f"HEAD request failed ({e}), using single-stream download")
+        return remote
+
+    remote["url"] = response.url
+    remote["size"] = int(response.headers.get("content-length", 0))
+    remote["etag"] = response.headers.get("ETag")
+    remote["ranges"] = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+    return remote
+
+
+def _load_meta() -> dict:
+    """Read metadata of a previous partial download, if any"""
+    try:
+        return json.loads(_meta_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _discard_partial():
+    """Remove the partial download and its metadata"""
+    for path in (_part_path(), _meta_path()):
+        if path.exists():
+            path.unlink()
+
+
+def _fetch_range(url: str, fd: int, start: int, end: int) -> int:
+    """Fetch bytes [start, end] of url and write them at the same offset in fd"""
+    response = _SESSION.get(
+        url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=TIMEOUT
+    )
+    response.raise_for_status()
+    if response.status_code != 206:
+        response.close()
+        raise RangeNotSupportedError(f"Expected 206, got {response.status_code}")
+
+    offset = start
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if chunk:
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+
+    if offset != end + 1:
+        raise IOError(f"Incomplete range {start}-{end}: got {offset - start} bytes")
+    return offset - start
+
+
+def _download_parallel(url: str, total_size: int):
+    """Download the file with DOWNLOAD_WORKERS concurrent Range requests"""
+    part_size = -(-total_size // DOWNLOAD_WORKERS)
+    ranges = [
+        (start, min(start + part_size, total_size) - 1)
+        for start in range(0, total_size, part_size)
+    ]
+    logger.info(f"Downloading {total_size} bytes in {len(ranges)} parallel ranges")
+
+    fd = os.open(_part_path(), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, total_size)
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(_fetch_range, url, fd, start, end)
+                for start, end in ranges
+            ]
+            downloaded = sum(future.result() for future in futures)
+    finally:
+        os.close(fd)
+
+    if downloaded != total_size:
+        raise IOError(f"Downloaded {downloaded} bytes, expected {total_size}")
+
+
+def _download_single(remote: dict) -> str:
+    """
+    Download the file as a single streamed GET, resuming a previous
+    partial download when the remote file is unchanged
+
+    Returns:
+        sha256 hex digest of the downloaded file
+    """
+    url = remote["url"]
+    part_path = _part_path()
+    meta = {"url": MODEL_URL, "etag": remote["etag"], "size": remote["size"]}
+
+    existing = part_path.stat().st_size if part_path.exists() else 0
+    can_resume = (
+        existing > 0
+        and remote["ranges"]
+        and (remote["etag"] or remote["size"])
+        and _load_meta() == meta
+    )
+
+    headers = {}
+    if can_resume:
+        headers["Range"] = f"bytes={existing}-"
+        logger.info(f"Resuming download at byte {existing}")
+    else:
+        existing = 0
+
+    response = _SESSION.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+    if response.status_code == 416:
+        # Partial file does not fit the remote one; start over next attempt
+        response.close()
+        _discard_partial()
+        raise IOError("Server rejected resume range (416)")
+    response.raise_for_status()
+
+    if existing and response.status_code != 206:
+        logger.info("Server ignored resume range, restarting download")
+        existing = 0
+
+    _meta_path().write_text(json.dumps(meta))
+
+    # Hash while streaming; a resumed download first hashes the bytes already on disk
+    digest = hashlib.sha256()
+    if existing:
+        with open(part_path, 'rb') as f:
+            while block := f.read(CHUNK_SIZE):
+                digest.update(block)
+
+    total_size = existing + int(response.headers.get('content-length', 0))
+    downloaded = existing
+    chunks = 0
+
+    with open(part_path, 'ab' if existing else 'wb', buffering=CHUNK_SIZE) as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+                digest.update(chunk)
+                downloaded += len(chunk)
+                chunks += 1
+                if total_size > 0 and chunks % LOG_EVERY_CHUNKS == 0:
+                    progress = (downloaded / total_size) * 100
+                    logger.info(f"Downloaded {progress:.1f}%")
+
+    if remote["size"] and downloaded != remote["size"]:
+        raise IOError(f"Downloaded {downloaded} bytes, expected {remote['size']}")
+
+    return digest.hexdigest()
+
+
+def _download(remote: dict) -> str:
+    """
+    Download the remote file into the partial path
+
+    Returns:
+        sha256 hex digest of the downloaded file
+    """
+    total_size = remote["size"]
+
+    # Only split files large enough to give every worker a full chunk
+    if (
+        remote["ranges"]
+        and DOWNLOAD_WORKERS > 1
+        and total_size >= DOWNLOAD_WORKERS * CHUNK_SIZE
+        and not _part_path().exists()
+    ):
+        try:
+            _download_parallel(remote["url"], total_size)
+            # Ranges complete out of order, so hash the assembled file
+            return _file_sha256(_part_path())
+        except RangeNotSupportedError as e:
+            logger.info(f"Range requests not honoured ({e}), falling back to single stream")
+            remote["ranges"] = False
+        except Exception:
+            # A sparse file with holes cannot be resumed
+            _discard_partial()
+            raise
+
+    return _download_single(remote)
+
 
 def download_model():
     """Download model if it doesn't exist"""
-    if MODEL_PATH.exists():
+    if _is_model_valid():
         logger.info(f"Model already exists at {MODEL_PATH}")
         return True
 
@@ -22,41 +309,44 @@ def download_model():
         logger.warning("MODEL_URL environment variable not set. Skipping download.")
         return False
 
-    logger.info(f"Downloading model from {MODEL_URL}...")
     MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    try:
-        # Support for Dropbox links (add dl=1 parameter)
-        url = MODEL_URL
-        if "dropbox.com" in url and "dl=0" in url:
-            url = url.replace("dl=0", "dl=1")
-        elif "dropbox.com" in url and "dl=" not in url:
-            url = url + ("&" if "?" in url else "?") + "dl=1"
-
-        response = requests.get(url, stream=True, timeout=300)
-        response.raise_for_status()
+    # Serialize concurrent workers sharing MODEL_CACHE_DIR: the first one
+    # downloads, the rest block here and then find the finished model
+    with open(_lock_path(), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if _is_model_valid():
+                logger.info(f"Model already exists at {MODEL_PATH}")
+                return True
+            return _download_with_retries()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
 
-        with open(MODEL_PATH, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        progress = (downloaded / total_size) * 100
-                        if downloaded % (1024 * 1024 * 50) == 0:  # Log every 50MB
-                            logger.info(f"Downloaded {progress:.1f}%")
+def _download_with_retries() -> bool:
+    """Download the model, retrying up to DOWNLOAD_RETRIES times"""
+    logger.info(f"Downloading model from {MODEL_URL}...")
 
-        logger.info(f"Model downloaded successfully to {MODEL_PATH}")
-        return True
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        try:
+            remote = _probe(_resolve_url(MODEL_URL))
+            digest = _download(remote)
 
-    except Exception as e:
-        logger.error(f"Failed to download model: {e}")
-        if MODEL_PATH.exists():
-            MODEL_PATH.unlink()  # Remove partial download
-        return False
+            if MODEL_SHA256 and digest != MODEL_SHA256:
+                _discard_partial()
+                raise IOError(f"sha256 mismatch: expected {MODEL_SHA256}, got {digest}")
+
+            _part_path().replace(MODEL_PATH)
+            _meta_path().unlink(missing_ok=True)
+            _sha_path().write_text(digest)
+            logger.info(f"Model downloaded successfully to {MODEL_PATH}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to download model (attempt {attempt}/{DOWNLOAD_RETRIES}): {e}")
+
+    return False
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
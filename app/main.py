@@ -2,6 +2,7 @@
 FastAPI application for financial stress prediction
 """
 from fastapi import FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
@@ -16,7 +17,7 @@ from .models import (
     ModelInfoResponse
 )
 from .predictor import FinancialStressPredictor
-from .download_model import download_model
+from .download_model import download_model, MODEL_PATH
 from . import __version__
 
 # Configure logging
@@ -44,7 +45,7 @@ async def lifespan(app: FastAPI):
         download_model()
 
         # Load predictor
-        predictor = FinancialStressPredictor()
+        predictor = FinancialStressPredictor(model_path=str(MODEL_PATH))
         logger.info("Model loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
@@ -127,8 +128,10 @@ async def predict(request: PredictionRequest):
                 detail="Model not loaded"
             )
 
-        # Make prediction
-        predicted_class, probabilities = predictor.predict_single(request.features)
+        # Make prediction in the threadpool so the event loop keeps serving requests
+        predicted_class, probabilities = await run_in_threadpool(
+            predictor.predict_single, request.features
+        )
 
         # Get worker_id if provided
         worker_id = request.features.worker_id
@@ -167,8 +170,8 @@ async def predict_batch(request: BatchPredictionRequest):
                 detail="Model not loaded"
             )
 
-        # Make predictions
-        results = predictor.predict_batch(request.workers)
+        # Make predictions in the threadpool so the event loop keeps serving requests
+        results = await run_in_threadpool(predictor.predict_batch, request.workers)
 
         # Create response
         predictions = []
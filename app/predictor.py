@@ -1,18 +1,43 @@
 """
 Model predictor class for loading and running predictions
 """
+import os
+import fcntl
+import functools
 import joblib
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from pathlib import Path
 from typing import List, Dict, Tuple
 import logging
-
-from .preprocessing import preprocess_input_data
+from pydantic import TypeAdapter
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+from sklearn.tree import BaseDecisionTree
+
+from .preprocessing import (
+    preprocess_input_data,
+    build_fill_values,
+    convert_credit_age,
+    NON_NEGATIVE_COLUMNS
+)
 from .models import WorkerFeatures
 
 logger = logging.getLogger(__name__)
 
+# Number of distinct feature vectors whose predictions are kept in memory
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+# Run inference through ONNX Runtime (requires skl2onnx and onnxruntime)
+USE_ONNX = os.getenv("USE_ONNX", "0") == "1"
+
+# Dumps a whole batch of validated workers in one call to pydantic-core
+_WORKER_LIST_ADAPTER = TypeAdapter(List[WorkerFeatures])
+
+# Models that split on float32 thresholds and so predict the same from float32
+# input. Others, such as HistGradientBoosting, bin and compare in float64
+_FLOAT32_MODELS = (RandomForestClassifier, ExtraTreesClassifier, BaseDecisionTree)
+
 
 class FinancialStressPredictor:
     """
@@ -36,6 +61,15 @@ class FinancialStressPredictor:
         self.numerical_features = None
         self.categorical_features = None
         self.feature_names = None
+        self._fill_values = None
+        self._input_columns = None
+        self._input_dtypes = None
+        self._cache_fields = None
+        self._predict_cached = None
+        self._onnx_session = None
+        self._float32_input = False
+        self._class_names = None
+        self._column_transformers = None
         self._loaded = False
 
         self.load_model()
@@ -48,7 +82,8 @@ class FinancialStressPredictor:
             if not self.model_path.exists():
                 raise FileNotFoundError(f"Model file not found: {self.model_path}")
 
-            artifacts = joblib.load(self.model_path)
+            # Memory-map large numpy arrays read-only so forked workers share pages
+            artifacts = joblib.load(self.model_path, mmap_mode='r')
 
             self.model = artifacts['model']
             self.preprocessor = artifacts['preprocessor']
@@ -60,6 +95,43 @@ class FinancialStressPredictor:
             self.categorical_features = artifacts['categorical_features']
             self.feature_names = artifacts['feature_names']
 
+            # Imputation values per feature, fixed for the lifetime of the model
+            self._fill_values = build_fill_values(
+                self.train_medians,
+                self.train_means,
+                self.numerical_cols_outliers,
+                self.numerical_features,
+                self.categorical_features
+            )
+
+            # Fixed input schema, so batch frames skip dtype inference and
+            # missing numbers become NaN floats rather than object None
+            self._input_columns = list(WorkerFeatures.model_fields)
+            self._input_dtypes = {
+                col: 'float64' for col in self.numerical_features if col in self._input_columns
+            }
+            self._input_dtypes.update({
+                col: 'string' for col in self.categorical_features if col in self._input_columns
+            })
+
+            # Identical requests (ignoring worker_id) are answered from an LRU cache,
+            # rebuilt on every load so stale predictions never survive a model swap
+            self._cache_fields = [col for col in self._input_columns if col != 'worker_id']
+            self._predict_cached = functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)(
+                self._predict_from_key
+            )
+
+            self._onnx_session = self._load_onnx_session() if USE_ONNX else None
+            # The ONNX graph takes float32 input
+            self._float32_input = (
+                self._onnx_session is not None or isinstance(self.model, _FLOAT32_MODELS)
+            )
+
+            # Plain Python class names, zipped against probability rows per request
+            self._class_names = tuple(self.label_encoder.classes_.tolist())
+
+            self._column_transformers = self._split_preprocessor()
+
             self._loaded = True
             logger.info("Model loaded successfully")
 
@@ -67,6 +139,80 @@ class FinancialStressPredictor:
             logger.error(f"Error loading model: {e}")
             raise
 
+    def _load_onnx_session(self):
+        """
+        Create an ONNX Runtime session for the model, converting it once and
+        caching the result next to the artifacts
+
+        Returns:
+            onnxruntime.InferenceSession, or None to fall back to sklearn
+        """
+        onnx_path = self.model_path.with_name(self.model_path.stem + "_onnx.onnx")
+
+        def is_stale() -> bool:
+            return (
+                not onnx_path.exists()
+                or onnx_path.stat().st_mtime < self.model_path.stat().st_mtime
+            )
+
+        try:
+            import onnxruntime as ort
+
+            if is_stale():
+                # Serialize conversion between workers sharing the model
+                # directory (same lock as download_model): the first one
+                # converts, the rest block here and then find the finished file
+                lock_path = self.model_path.with_name(self.model_path.name + ".lock")
+                with open(lock_path, 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        if is_stale():
+                            self._convert_to_onnx(onnx_path)
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+            session = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+            logger.info("Using ONNX Runtime for inference")
+            return session
+
+        except Exception as e:
+            logger.warning(f"ONNX inference unavailable ({e}), using sklearn model")
+            return None
+
+    def _convert_to_onnx(self, onnx_path: Path):
+        """
+        Convert the model to ONNX and write it to onnx_path atomically, so
+        readers never see a partially written file
+
+        Args:
+            onnx_path: Destination of the converted model
+        """
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+
+        logger.info(f"Converting model to ONNX at {onnx_path}")
+        onnx_model = convert_sklearn(
+            self.model,
+            initial_types=[('input', FloatTensorType([None, self.model.n_features_in_]))],
+            options={id(self.model): {'zipmap': False}}
+        )
+        part_path = onnx_path.with_name(onnx_path.name + ".part")
+        part_path.write_bytes(onnx_model.SerializeToString())
+        os.replace(part_path, onnx_path)
+
+    def _predict_proba(self, X_transformed) -> np.ndarray:
+        """Class probabilities from ONNX Runtime if available, else sklearn"""
+        if self._onnx_session is None:
+            return self.model.predict_proba(X_transformed)
+
+        if sparse.issparse(X_transformed):
+            X_transformed = X_transformed.toarray()
+        # Outputs are (label, probabilities)
+        return self._onnx_session.run(
+            [self._onnx_session.get_outputs()[1].name],
+            {self._onnx_session.get_inputs()[0].name: X_transformed}
+        )[0]
+
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self._loaded
@@ -81,12 +227,15 @@ class FinancialStressPredictor:
         Returns:
             Preprocessed DataFrame
         """
-        # Remove worker_id if present (not used for prediction)
+        # Remove worker_id if present (not used for prediction).
+        # drop() already returns a new frame, so preprocessing can work on it in place
         if 'worker_id' in data.columns:
-            worker_ids = data['worker_id'].copy()
-            data = data.drop('worker_id', axis=1)
+            worker_ids = data['worker_id'].to_numpy()
+            data = data.drop(columns='worker_id')
+            copy = False
         else:
             worker_ids = None
+            copy = True
 
         # Apply preprocessing pipeline
         processed_data = preprocess_input_data(
@@ -95,7 +244,9 @@ class FinancialStressPredictor:
             self.train_means,
             self.numerical_cols_outliers,
             self.numerical_features,
-            self.categorical_features
+            self.categorical_features,
+            copy=copy,
+            fill_values=self._fill_values
         )
 
         # Ensure columns are in the correct order
@@ -103,6 +254,71 @@ class FinancialStressPredictor:
 
         return processed_data, worker_ids
 
+    def _split_preprocessor(self):
+        """
+        Resolve the fitted ColumnTransformer into (transformer, column positions)
+        pairs over feature_names, so transform can call each sub-transformer
+        directly instead of going through ColumnTransformer's per-call column
+        lookup and dispatch
+
+        Returns:
+            List of (transformer, positions), or None if the preprocessor
+            layout is not supported and must be called as a whole
+        """
+        transformers = getattr(self.preprocessor, 'transformers_', None)
+        if transformers is None:
+            return None
+
+        positions = {col: i for i, col in enumerate(self.feature_names)}
+        split = []
+        for _, transformer, columns in transformers:
+            if isinstance(transformer, str) and transformer == 'drop':
+                continue
+            if (
+                isinstance(transformer, str)
+                or not all(isinstance(col, str) and col in positions for col in columns)
+            ):
+                return None
+            split.append((transformer, [positions[col] for col in columns]))
+
+        return split
+
+    def transform(self, processed_df: pd.DataFrame):
+        """
+        Apply the fitted preprocessor
+
+        Forests and decision trees compare against float32 thresholds
+        internally, and the ONNX graph takes float32 input, so for those the
+        result is cast to float32 here to avoid an extra conversion copy.
+        Any other model, e.g. HistGradientBoosting, keeps float64 input so
+        its predictions are not changed by rounding.
+
+        Args:
+            processed_df: Preprocessed DataFrame
+
+        Returns:
+            float32 or float64 feature matrix (dense or sparse)
+        """
+        if self._column_transformers is None:
+            X_transformed = self.preprocessor.transform(processed_df)
+        else:
+            # processed_df is already in feature_names order, so columns are sliced by position
+            blocks = [
+                transformer.transform(processed_df.iloc[:, cols])
+                for transformer, cols in self._column_transformers
+            ]
+            if self.preprocessor.sparse_output_:
+                X_transformed = sparse.hstack(blocks, format='csr')
+            else:
+                X_transformed = np.hstack([
+                    block.toarray() if sparse.issparse(block) else block for block in blocks
+                ])
+
+        dtype = np.float32 if self._float32_input else np.float64
+        if sparse.issparse(X_transformed):
+            return X_transformed.astype(dtype, copy=False)
+        return np.ascontiguousarray(X_transformed, dtype=dtype)
+
     def predict_single(self, features: WorkerFeatures) -> Tuple[str, Dict[str, float]]:
         """
         Make prediction for a single worker
@@ -116,31 +332,61 @@ class FinancialStressPredictor:
         if not self._loaded:
             raise RuntimeError("Model not loaded")
 
-        # Convert to DataFrame
         data_dict = features.model_dump()
-        df = pd.DataFrame([data_dict])
+        key = tuple(data_dict[col] for col in self._cache_fields)
+        predicted_class, prob_dict = self._predict_cached(key)
 
-        # Store worker_id if present
-        worker_id = data_dict.get('worker_id')
+        # Hand out a copy so callers cannot mutate the cached entry
+        return predicted_class, dict(prob_dict)
 
-        # Preprocess
-        processed_df, _ = self.preprocess(df)
+    def _predict_from_key(self, key: Tuple) -> Tuple[str, Dict[str, float]]:
+        """Rebuild the feature dict from a cache key and predict it"""
+        return self._predict_single_fast(dict(zip(self._cache_fields, key)))
 
-        # Transform with preprocessor
-        X_transformed = self.preprocessor.transform(processed_df)
+    def _predict_single_fast(self, features_dict: Dict) -> Tuple[str, Dict[str, float]]:
+        """
+        Single-row prediction that bypasses the DataFrame preprocessing chain
 
-        # Predict
-        prediction = self.model.predict(X_transformed)[0]
-        probabilities = self.model.predict_proba(X_transformed)[0]
+        Mirrors preprocess_input_data on a plain dict and builds the one-row
+        frame the preprocessor expects directly in feature order.
+
+        Args:
+            features_dict: Raw feature values as returned by WorkerFeatures.model_dump()
+
+        Returns:
+            Tuple of (predicted_class, probability_dict)
+        """
+        values = dict(features_dict)
+
+        # Convert credit age to months
+        values['credit_age_months_numeric'] = convert_credit_age(
+            values.pop('credit_age_months', None)
+        )
+
+        # Clip negative values
+        for col in NON_NEGATIVE_COLUMNS:
+            if values.get(col) is not None:
+                values[col] = max(values[col], 0)
+
+        # Fill missing values and order columns
+        row = []
+        for col in self.feature_names:
+            value = values.get(col)
+            if value is None or value != value:
+                value = self._fill_values.get(col)
+            row.append(value)
+
+        X_transformed = self.transform(pd.DataFrame([row], columns=self.feature_names))
+
+        # Predict; the predicted class is the most probable one
+        probabilities = self._predict_proba(X_transformed)[0]
+        prediction = self.model.classes_[np.argmax(probabilities)]
 
         # Decode prediction
         predicted_class = self.label_encoder.inverse_transform([prediction])[0]
 
         # Create probability dictionary
-        prob_dict = {
-            class_name: float(prob)
-            for class_name, prob in zip(self.label_encoder.classes_, probabilities)
-        }
+        prob_dict = dict(zip(self._class_names, probabilities.astype(np.float64).tolist()))
 
         return predicted_class, prob_dict
 
@@ -158,32 +404,31 @@ class FinancialStressPredictor:
             raise RuntimeError("Model not loaded")
 
         # Convert to DataFrame
-        data_dicts = [f.model_dump() for f in features_list]
-        df = pd.DataFrame(data_dicts)
+        data_dicts = _WORKER_LIST_ADAPTER.dump_python(features_list)
+        df = pd.DataFrame.from_records(data_dicts, columns=self._input_columns)
+        df = df.astype(self._input_dtypes)
 
         # Preprocess
         processed_df, worker_ids = self.preprocess(df)
 
         # Transform with preprocessor
-        X_transformed = self.preprocessor.transform(processed_df)
+        X_transformed = self.transform(processed_df)
 
-        # Predict
-        predictions = self.model.predict(X_transformed)
-        probabilities = self.model.predict_proba(X_transformed)
+        # Predict; the predicted class is the most probable one
+        probabilities = self._predict_proba(X_transformed)
+        predictions = self.model.classes_[np.argmax(probabilities, axis=1)]
 
         # Decode predictions
         predicted_classes = self.label_encoder.inverse_transform(predictions)
 
-        # Create results
-        results = []
-        for pred_class, probs in zip(predicted_classes, probabilities):
-            prob_dict = {
-                class_name: float(prob)
-                for class_name, prob in zip(self.label_encoder.classes_, probs)
-            }
-            results.append((pred_class, prob_dict))
-
-        return results
+        # Create results; tolist() converts every probability to a Python float in one call
+        return [
+            (pred_class, dict(zip(self._class_names, probs)))
+            for pred_class, probs in zip(
+                predicted_classes.tolist(),
+                probabilities.astype(np.float64, copy=False).tolist()
+            )
+        ]
 
     def get_model_info(self) -> Dict:
         """
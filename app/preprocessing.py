@@ -1,51 +1,85 @@
 """
 Data preprocessing functions
 """
+import re
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+# Credit age strings look like '17 y. 11 m.'
+CREDIT_AGE_PATTERN = r'(?P<years>\d+)\s*y\.\s*(?P<months>\d+)\s*m\.'
+CREDIT_AGE_RE = re.compile(CREDIT_AGE_PATTERN)
 
-def preprocess_credit_age(df: pd.DataFrame) -> pd.DataFrame:
+# Columns that cannot be negative
+NON_NEGATIVE_COLUMNS = ['num_savings_accounts', 'avg_loan_delay_days']
+
+
+def convert_credit_age(value) -> float:
+    """
+    Convert a single credit age string (e.g., '17 y. 11 m.') to months
+
+    Args:
+        value: Credit age string or missing value
+
+    Returns:
+        Number of months, NaN if missing or malformed
+    """
+    match = CREDIT_AGE_RE.search(value) if isinstance(value, str) else None
+    if match is None:
+        return np.nan
+    return int(match['years']) * 12 + int(match['months'])
+
+
+def parse_credit_age(credit_age: pd.Series) -> pd.Series:
+    """
+    Convert credit age strings (e.g., '17 y. 11 m.') to a number of months
+
+    Args:
+        credit_age: Series of credit age strings
+
+    Returns:
+        Float Series of months, NaN where the value is missing or malformed
+    """
+    parts = credit_age.str.extract(CREDIT_AGE_RE)
+    return (
+        pd.to_numeric(parts['years'], errors='coerce') * 12
+        + pd.to_numeric(parts['months'], errors='coerce')
+    )
+
+
+def preprocess_credit_age(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     """
     Convert credit_age_months from string format (e.g., '17 y. 11 m.') to numeric
 
     Args:
         df: DataFrame with credit_age_months column
+        copy: Work on a copy; pass False to modify df in place
 
     Returns:
         DataFrame with credit_age_months_numeric column
     """
-    df = df.copy()
-
-    def convert_credit_age(x):
-        if pd.isna(x):
-            return np.nan
-        try:
-            parts = x.replace(' y.', '').replace(' m.', '').split(' ')
-            years = int(parts[0])
-            months = int(parts[1])
-            return years * 12 + months
-        except:
-            return np.nan
-
-    df['credit_age_months_numeric'] = df['credit_age_months'].apply(convert_credit_age)
+    if copy:
+        df = df.copy()
+
+    df['credit_age_months_numeric'] = parse_credit_age(df['credit_age_months'])
     df.drop('credit_age_months', axis=1, inplace=True)
 
     return df
 
 
-def fix_negative_values(df: pd.DataFrame) -> pd.DataFrame:
+def fix_negative_values(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     """
     Fix negative values in specific columns by clipping to 0
 
     Args:
         df: DataFrame with numerical columns
+        copy: Work on a copy; pass False to modify df in place
 
     Returns:
         DataFrame with corrected values
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
 
     if 'num_savings_accounts' in df.columns:
         df['num_savings_accounts'] = df['num_savings_accounts'].clip(lower=0)
@@ -62,7 +96,8 @@ def fill_missing_values(
     categorical_cols: List[str],
     train_medians: Dict[str, float],
     train_means: Dict[str, float],
-    numerical_cols_outliers: List[str]
+    numerical_cols_outliers: List[str],
+    copy: bool = True
 ) -> pd.DataFrame:
     """
     Fill missing values using training statistics
@@ -74,40 +109,75 @@ def fill_missing_values(
         train_medians: Dictionary of median values from training data
         train_means: Dictionary of mean values from training data
         numerical_cols_outliers: List of columns with outliers (use median)
+        copy: Work on a copy; pass False to modify df in place
 
     Returns:
         DataFrame with filled missing values
     """
-    df = df.copy()
-
-    # Fill numerical columns
-    for col in numerical_cols:
-        if col in df.columns and df[col].isnull().sum() > 0:
-            if col in numerical_cols_outliers:
-                fill_value = train_medians.get(col, df[col].median())
-            else:
-                fill_value = train_means.get(col, df[col].mean())
-            df[col].fillna(fill_value, inplace=True)
-
-    # Fill categorical columns
-    for col in categorical_cols:
-        if col in df.columns and df[col].isnull().sum() > 0:
-            df[col].fillna('Unknown', inplace=True)
+    if copy:
+        df = df.copy()
+
+    # fillna is a no-op on columns without missing values, so no per-column guard is needed
+    df.fillna(
+        build_fill_values(
+            train_medians,
+            train_means,
+            numerical_cols_outliers,
+            numerical_cols,
+            categorical_cols
+        ),
+        inplace=True
+    )
 
     return df
 
 
+def build_fill_values(
+    train_medians: Dict[str, float],
+    train_means: Dict[str, float],
+    numerical_cols_outliers: List[str],
+    numerical_features: List[str],
+    categorical_features: List[str]
+) -> Dict:
+    """
+    Build the per-column imputation values used by preprocess_input_data
+
+    Args:
+        train_medians: Median values from training data
+        train_means: Mean values from training data
+        numerical_cols_outliers: Columns with outliers (use median)
+        numerical_features: List of numerical feature names
+        categorical_features: List of categorical feature names
+
+    Returns:
+        Dictionary mapping column name to fill value
+    """
+    outliers = set(numerical_cols_outliers)
+    fill_values = {}
+    for col in numerical_features:
+        stats = train_medians if col in outliers else train_means
+        if stats.get(col) is not None:
+            fill_values[col] = stats[col]
+    fill_values.update({col: 'Unknown' for col in categorical_features})
+    return fill_values
+
+
 def preprocess_input_data(
     data: pd.DataFrame,
     train_medians: Dict[str, float],
     train_means: Dict[str, float],
     numerical_cols_outliers: List[str],
     numerical_features: List[str],
-    categorical_features: List[str]
+    categorical_features: List[str],
+    copy: bool = True,
+    fill_values: Optional[Dict] = None
 ) -> pd.DataFrame:
     """
     Complete preprocessing pipeline for input data
 
+    Applies the credit age conversion, negative value clipping and missing
+    value imputation in a single pass over at most one copy of the input.
+
     Args:
         data: Raw input DataFrame
         train_medians: Median values from training data
@@ -115,22 +185,33 @@ def preprocess_input_data(
         numerical_cols_outliers: Columns with outliers
         numerical_features: List of numerical feature names
         categorical_features: List of categorical feature names
+        copy: Work on a copy; pass False when the caller owns data
+        fill_values: Prebuilt result of build_fill_values, computed here if omitted
 
     Returns:
         Preprocessed DataFrame ready for model prediction
     """
-    df = data.copy()
-
-    # Apply transformations
-    df = preprocess_credit_age(df)
-    df = fix_negative_values(df)
-    df = fill_missing_values(
-        df,
-        numerical_features,
-        categorical_features,
-        train_medians,
-        train_means,
-        numerical_cols_outliers
-    )
+    df = data.copy() if copy else data
+
+    # Convert credit age to months
+    if 'credit_age_months' in df.columns:
+        df['credit_age_months_numeric'] = parse_credit_age(df['credit_age_months'])
+        df.drop(columns='credit_age_months', inplace=True)
+
+    # Clip negative values
+    clip_cols = [col for col in NON_NEGATIVE_COLUMNS if col in df.columns]
+    if clip_cols:
+        df[clip_cols] = df[clip_cols].clip(lower=0)
+
+    # Fill missing values with training statistics
+    if fill_values is None:
+        fill_values = build_fill_values(
+            train_medians,
+            train_means,
+            numerical_cols_outliers,
+            numerical_features,
+            categorical_features
+        )
+    df.fillna(fill_values, inplace=True)
 
     return df
@@ -1,7 +1,9 @@
+import re
 import streamlit as st
 import requests
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 
 # Page config
 st.set_page_config(
@@ -11,8 +13,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for modern, clean design
-st.markdown("""
+# Custom CSS for modern, clean design. It is emitted on every run:
+# Streamlit drops elements a rerun does not re-emit, so a once-per-session
+# guard would unstyle the page after the first interaction
+_CSS_RAW = """
 <style>
     /* Hide Streamlit default elements */
     #MainMenu {visibility: hidden;}
@@ -136,16 +140,270 @@ st.markdown("""
         transition: all 0.2s;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Strip comments and whitespace so they are not sent to the browser
+_CSS = re.sub(r"/\*.*?\*/", "", _CSS_RAW, flags=re.S)
+_CSS = re.sub(r"\s+", " ", _CSS).strip()
+_CSS = re.sub(r"\s*([{};:])\s*", r"\1", _CSS)
+
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # Initialize session state
 if 'prediction_result' not in st.session_state:
     st.session_state.prediction_result = None
 if 'auto_predict' not in st.session_state:
     st.session_state.auto_predict = False
+if 'last_state' not in st.session_state:
+    st.session_state.last_state = None
 
 # API URL
 API_URL = "http://localhost:8000"
+# (connect, read) timeouts in seconds: fail fast when the API is unreachable
+API_TIMEOUT = (3, 30)
+# Part of the persisted prediction cache key; bump when the served model changes
+_MODEL_VERSION = "1.0.0"
+
+# Stress level -> (card CSS class, emoji, title, description); anything
+# unrecognised is shown as high stress
+_STRESS_META = {
+    "Low": ("stress-low", "✅", "Low Stress Level", "Financial status is stable"),
+    "Moderate": ("stress-moderate", "⚠️", "Moderate Stress Level", "Financial attention required"),
+    "High": ("stress-high", "🚨", "High Stress Level", "Urgent action needed"),
+}
+_COLORS_MAP = {'Low': '#10b981', 'Moderate': '#f59e0b', 'High': '#ef4444'}
+
+
+class APIError(Exception):
+    """Non-200 response from the prediction API"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+# A blocking client is fine here: Streamlit runs every session's script in
+# its own thread, so one user's request does not hold up another's rerun
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so API calls reuse a keep-alive connection"""
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    # Retry transient gateway/loading errors only; the final error response is
+    # returned rather than raised so it still reaches the APIError handling
+    retry = Retry(
+        total=2, connect=0, read=0, backoff_factor=0.2,
+        status_forcelist=(502, 503, 504), allowed_methods=("POST",),
+        raise_on_status=False
+    )
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
+
+# Persisted to disk so cached predictions survive app restarts. Streamlit
+# ignores ttl for persisted caches, so model_version is what invalidates them.
+# It has no default: Streamlit hashes only the arguments actually passed
+@st.cache_data(max_entries=1024, persist="disk", show_spinner=False)
+def predict(features_items, model_version):
+    """
+    Call /predict, caching results per unique feature set and model version
+
+    features_items is the sorted tuple of (name, value) pairs so it can be
+    hashed as a cache key. Errors are raised, so they are never cached.
+    """
+    # The session sends the JSON Content-Type header; orjson does the (de)serialization
+    response = get_session().post(
+        f"{API_URL}/predict", data=orjson.dumps({"features": dict(features_items)}),
+        timeout=API_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise APIError(response.status_code, response.text)
+    return orjson.loads(response.content)
+
+
+# Figure objects are kept as-is rather than via st.cache_data: unpickling a
+# Plotly figure costs more than building it
+@st.cache_resource(max_entries=64)
+def build_prediction_figure(probability_items, stress_level):
+    """
+    Build the probability bar chart and confidence gauge
+
+    Args:
+        probability_items: Tuple of (class, probability) pairs
+        stress_level: Predicted stress level
+
+    Returns:
+        Plotly figure
+    """
+    # Imported here so pages that never show the chart skip loading Plotly
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    probabilities = dict(probability_items)
+
+    # Create a more informative chart
+    fig = make_subplots(
+        rows=1, cols=2,
+        specs=[[{"type": "bar"}, {"type": "indicator"}]],
+        subplot_titles=("Probability Distribution", "Confidence Level")
+    )
+    
+    # Bar chart
+    bar_colors = [_COLORS_MAP.get(k, '#64748b') for k in probabilities]
+    pcts = [v * 100 for v in probabilities.values()]
+    texts = [f"{p:.1f}%" for p in pcts]
+    
+    fig.add_trace(
+        go.Bar(
+            x=list(probabilities.keys()),
+            y=pcts,
+            marker_color=bar_colors,
+            text=texts,
+            textposition='auto',
+            name="Probability",
+            showlegend=False
+        ),
+        row=1, col=1
+    )
+    
+    # Gauge chart for confidence
+    fig.add_trace(
+        go.Indicator(
+            mode="gauge+number+delta",
+            value=max(pcts),
+            domain={'x': [0, 1], 'y': [0, 1]},
+            title={'text': "Confidence"},
+            delta={'reference': 50},
+            gauge={
+                'axis': {'range': [None, 100]},
+                'bar': {'color': _COLORS_MAP.get(stress_level, '#64748b')},
+                'steps': [
+                    {'range': [0, 33], 'color': "lightgray"},
+                    {'range': [33, 66], 'color': "gray"},
+                    {'range': [66, 100], 'color': "darkgray"}
+                ],
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': 90
+                }
+            }
+        ),
+        row=1, col=2
+    )
+    
+    fig.update_layout(
+        height=300,
+        showlegend=False,
+        margin=dict(l=20, r=20, t=40, b=20)
+    )
+
+    return fig
+
+
+def _render_result_card(stress_level, show_description=True):
+    """
+    Render the coloured stress level card
+
+    Args:
+        stress_level: Predicted stress level
+        show_description: Add the one-line description below the level
+    """
+    color_class, emoji, title, description = _STRESS_META.get(
+        stress_level, _STRESS_META["High"]
+    )
+    description_html = (
+        f'<div style="opacity: 0.9; font-size: 0.9rem; margin-top: 0.5rem;">{description}</div>'
+        if show_description else ""
+    )
+    st.markdown(f"""
+    <div class="result-card {color_class}">
+        <div class="result-title">{title}</div>
+        <div class="result-value">{emoji} {stress_level}</div>{description_html}
+    </div>
+    """, unsafe_allow_html=True)
+
+
+@st.fragment
+def render_prediction_panel(result, fresh):
+    """
+    Render a prediction result
+
+    Runs as a fragment, so interacting with widgets inside the panel only
+    reruns this function instead of the whole page.
+
+    Args:
+        result: Response of the /predict endpoint
+        fresh: True for a prediction made in this run (full details),
+            False for a previous result kept in session state
+    """
+    stress_level = result.get("predicted_stress_level", "Unknown")
+    probabilities = result.get("prediction_probabilities", {})
+    
+    # Display stress level card
+    _render_result_card(stress_level, show_description=fresh)
+    
+    if fresh:
+        # Probability visualization with native widgets
+        st.markdown("#### 📊 Probabilities")
+        for level, prob in probabilities.items():
+            st.progress(prob, text=f"{level}: {prob*100:.1f}%")
+        if probabilities:
+            st.metric("Confidence", f"{max(probabilities.values())*100:.1f}%")
+        
+        # The Plotly chart is opt-in; toggling it only reruns this fragment
+        if st.toggle("Detailed chart"):
+            # Figures are cached per (rounded) result, so re-displaying the same
+            # prediction skips the Plotly graph-object construction
+            fig = build_prediction_figure(
+                tuple((k, round(v, 4)) for k, v in probabilities.items()),
+                stress_level
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Detailed probabilities
+        with st.expander("📋 Detailed Probabilities"):
+            prob_col1, prob_col2, prob_col3 = st.columns(3)
+            for i, (level, prob) in enumerate(probabilities.items()):
+                with [prob_col1, prob_col2, prob_col3][i]:
+                    st.metric(
+                        level,
+                        f"{prob*100:.1f}%",
+                        delta=None
+                    )
+        
+        # Recommendations based on stress level
+        st.markdown("---")
+        st.markdown("#### 💡 Recommendations")
+        
+        if stress_level == "Low":
+            st.success("""
+            ✅ **Excellent financial status!**
+            - Continue maintaining current level
+            - Consider increasing investments
+            - Maintain emergency fund
+            """)
+        elif stress_level == "Moderate":
+            st.warning("""
+            ⚠️ **Attention required:**
+            - Reduce credit utilization to 30%
+            - Create debt repayment plan
+            - Increase savings
+            - Consider loan consolidation
+            """)
+        else:
+            st.error("""
+            🚨 **Critical situation:**
+            - Contact financial advisor immediately
+            - Prioritize high-interest debt repayment
+            - Consider debt restructuring
+            - Create emergency action plan
+            """)
+    else:
+        st.info("💡 Click button to update prediction")
+
 
 # Header
 st.markdown('<h1 class="main-header">💰 Financial Stress Predictor</h1>', unsafe_allow_html=True)
@@ -164,75 +422,93 @@ with st.sidebar:
     
     st.markdown("---")
     
-    # Demographics
-    st.markdown('<div class="section-header">👤 Demographics</div>', unsafe_allow_html=True)
-    worker_age = st.slider("Age", 18, 70, 30, help="Worker age")
-    job_sector = st.selectbox("Job Sector", [
-        "Driver", "Writer", "Engineer", "Doctor", "Teacher", 
-        "Designer", "Developer", "Consultant", "Freelancer", "Other"
-    ], help="Type of gig work")
-    
-    st.markdown("---")
-    
-    # Income & Savings
-    st.markdown('<div class="section-header">💵 Income & Savings</div>', unsafe_allow_html=True)
-    monthly_income = st.number_input(
-        "Monthly Gig Income ($)", 
-        0, 50000, 3000, 
-        step=100,
-        help="Monthly income from gig work"
-    )
-    annual_income = st.number_input(
-        "Estimated Annual Income ($)", 
-        0, 500000, 36000, 
-        step=1000,
-        help="Estimated annual income"
-    )
-    num_savings = st.slider("Savings Accounts", 0, 10, 1)
-    monthly_investments = st.number_input(
-        "Monthly Investments ($)", 
-        0, 10000, 100, 
-        step=50
-    )
-    
-    st.markdown("---")
-    
-    # Credit Information
-    st.markdown('<div class="section-header">💳 Credit Information</div>', unsafe_allow_html=True)
-    num_credit_cards = st.slider("Credit Cards", 0, 15, 2)
-    credit_utilization = st.slider("Credit Utilization (%)", 0, 100, 30, help="Percentage of credit limit used")
-    avg_credit_interest = st.slider("Avg Credit Interest (%)", 0, 40, 15)
-    num_active_loans = st.slider("Active Loans", 0, 20, 1)
-    
-    st.markdown("---")
-    
-    # Payment History
-    st.markdown('<div class="section-header">📅 Payment History</div>', unsafe_allow_html=True)
-    missed_payments = st.slider("Missed Payment Events", 0, 50, 5, help="Number of missed or late payments")
-    avg_loan_delay = st.slider("Avg Loan Delay (days)", 0, 180, 10)
-    recent_credit_checks = st.slider("Recent Credit Checks", 0, 20, 2, help="Credit inquiries in past 3 months")
-    
-    st.markdown("---")
-    
-    # Financial Status
-    st.markdown('<div class="section-header">📊 Financial Status</div>', unsafe_allow_html=True)
-    total_liability = st.number_input(
-        "Total Liability ($)", 
-        0, 100000, 2000, 
-        step=100,
-        help="Total amount of debt"
-    )
-    end_of_month_balance = st.number_input(
-        "End of Month Balance ($)", 
-        -10000, 50000, 500, 
-        step=100,
-        help="Account balance at month end"
-    )
-    
-    st.markdown("---")
-    
-    # Predict button
-    predict_button = st.button("🔮 Get Prediction", type="primary", use_container_width=True)
+    # In manual mode the inputs live in a form so changing them does not rerun
+    # the script (and call the API) until it is submitted. Auto prediction
+    # needs every change to rerun, so its inputs sit in a plain container.
+    # Keys keep the entered values when switching between the two
+    if auto_predict:
+        inputs = st.container()
+    else:
+        inputs = st.form("prediction_form", clear_on_submit=False)
+
+    with inputs:
+        # Demographics
+        st.markdown('<div class="section-header">👤 Demographics</div>', unsafe_allow_html=True)
+        worker_age = st.slider("Age", 18, 70, 30, help="Worker age", key="worker_age")
+        job_sector = st.selectbox("Job Sector", [
+            "Driver", "Writer", "Engineer", "Doctor", "Teacher", 
+            "Designer", "Developer", "Consultant", "Freelancer", "Other"
+        ], help="Type of gig work", key="job_sector")
+        
+        st.markdown("---")
+        
+        # Income & Savings
+        st.markdown('<div class="section-header">💵 Income & Savings</div>', unsafe_allow_html=True)
+        monthly_income = st.number_input(
+            "Monthly Gig Income ($)", 
+            0, 50000, 3000, 
+            step=100,
+            help="Monthly income from gig work",
+            key="monthly_income"
+        )
+        annual_income = st.number_input(
+            "Estimated Annual Income ($)", 
+            0, 500000, 36000, 
+            step=1000,
+            help="Estimated annual income",
+            key="annual_income"
+        )
+        num_savings = st.slider("Savings Accounts", 0, 10, 1, key="num_savings")
+        monthly_investments = st.number_input(
+            "Monthly Investments ($)", 
+            0, 10000, 100, 
+            step=50,
+            key="monthly_investments"
+        )
+        
+        st.markdown("---")
+        
+        # Credit Information
+        st.markdown('<div class="section-header">💳 Credit Information</div>', unsafe_allow_html=True)
+        num_credit_cards = st.slider("Credit Cards", 0, 15, 2, key="num_credit_cards")
+        credit_utilization = st.slider("Credit Utilization (%)", 0, 100, 30, help="Percentage of credit limit used", key="credit_utilization")
+        avg_credit_interest = st.slider("Avg Credit Interest (%)", 0, 40, 15, key="avg_credit_interest")
+        num_active_loans = st.slider("Active Loans", 0, 20, 1, key="num_active_loans")
+        
+        st.markdown("---")
+        
+        # Payment History
+        st.markdown('<div class="section-header">📅 Payment History</div>', unsafe_allow_html=True)
+        missed_payments = st.slider("Missed Payment Events", 0, 50, 5, help="Number of missed or late payments", key="missed_payments")
+        avg_loan_delay = st.slider("Avg Loan Delay (days)", 0, 180, 10, key="avg_loan_delay")
+        recent_credit_checks = st.slider("Recent Credit Checks", 0, 20, 2, help="Credit inquiries in past 3 months", key="recent_credit_checks")
+        
+        st.markdown("---")
+        
+        # Financial Status
+        st.markdown('<div class="section-header">📊 Financial Status</div>', unsafe_allow_html=True)
+        total_liability = st.number_input(
+            "Total Liability ($)", 
+            0, 100000, 2000, 
+            step=100,
+            help="Total amount of debt",
+            key="total_liability"
+        )
+        end_of_month_balance = st.number_input(
+            "End of Month Balance ($)", 
+            -10000, 50000, 500, 
+            step=100,
+            help="Account balance at month end",
+            key="end_of_month_balance"
+        )
+        
+        st.markdown("---")
+        
+        if auto_predict:
+            predict_button = st.button("🔮 Get Prediction", type="primary", use_container_width=True)
+        else:
+            # Submitting the form applies all widget changes in a single rerun
+            predict_button = st.form_submit_button("🔮 Get Prediction", type="primary", use_container_width=True)
 
 # Main content area
 col1, col2 = st.columns([1.5, 1])
@@ -317,10 +593,27 @@ with col1:
 with col2:
     st.markdown("### 🎯 Prediction Result")
     
-    # Check if we should predict
-    should_predict = predict_button or (auto_predict and st.session_state.prediction_result is None)
+    # Raw widget values; the request payload is only built when they change
+    state_key = (
+        worker_age, job_sector, monthly_income, annual_income, num_savings,
+        monthly_investments, num_credit_cards, credit_utilization,
+        avg_credit_interest, num_active_loans, missed_payments, avg_loan_delay,
+        recent_credit_checks, total_liability, end_of_month_balance
+    )
+    state_changed = st.session_state.last_state != state_key
+    
+    # Check if we should predict. In manual mode the inputs only change when
+    # the form is submitted, which also sets predict_button. In auto mode they
+    # sit outside the form, so every change reruns the script and predicts if
+    # the inputs differ from the last successful prediction
+    cached_result = st.session_state.prediction_result
+    should_predict = predict_button or (auto_predict and state_changed)
+    
+    if should_predict and cached_result and not state_changed:
+        # Inputs unchanged since the last prediction: show it again as is
+        render_prediction_panel(cached_result, fresh=True)
     
-    if predict_button or (auto_predict and st.session_state.prediction_result is None):
+    elif should_predict:
         with st.spinner("🔄 Analyzing financial data..."):
             payload = {
                 "features": {
@@ -343,145 +636,17 @@ with col2:
             }
             
             try:
-                response = requests.post(f"{API_URL}/predict", json=payload, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    st.session_state.prediction_result = result
-                    stress_level = result.get("predicted_stress_level", "Unknown")
-                    probabilities = result.get("prediction_probabilities", {})
-                    
-                    # Display stress level card
-                    if stress_level == "Low":
-                        color_class = "stress-low"
-                        emoji = "✅"
-                        title = "Low Stress Level"
-                        description = "Financial status is stable"
-                    elif stress_level == "Moderate":
-                        color_class = "stress-moderate"
-                        emoji = "⚠️"
-                        title = "Moderate Stress Level"
-                        description = "Financial attention required"
-                    else:
-                        color_class = "stress-high"
-                        emoji = "🚨"
-                        title = "High Stress Level"
-                        description = "Urgent action needed"
-                    
-                    st.markdown(f"""
-                    <div class="result-card {color_class}">
-                        <div class="result-title">{title}</div>
-                        <div class="result-value">{emoji} {stress_level}</div>
-                        <div style="opacity: 0.9; font-size: 0.9rem; margin-top: 0.5rem;">{description}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Probability visualization
-                    st.markdown("#### 📊 Probabilities")
-                    
-                    # Create a more informative chart
-                    fig = make_subplots(
-                        rows=1, cols=2,
-                        specs=[[{"type": "bar"}, {"type": "indicator"}]],
-                        subplot_titles=("Probability Distribution", "Confidence Level")
-                    )
-                    
-                    # Bar chart
-                    colors_map = {'Low': '#10b981', 'Moderate': '#f59e0b', 'High': '#ef4444'}
-                    bar_colors = [colors_map.get(k, '#64748b') for k in probabilities.keys()]
-                    
-                    fig.add_trace(
-                        go.Bar(
-                            x=list(probabilities.keys()),
-                            y=[v * 100 for v in probabilities.values()],
-                            marker_color=bar_colors,
-                            text=[f"{v*100:.1f}%" for v in probabilities.values()],
-                            textposition='auto',
-                            name="Probability",
-                            showlegend=False
-                        ),
-                        row=1, col=1
-                    )
-                    
-                    # Gauge chart for confidence
-                    max_prob = max(probabilities.values())
-                    fig.add_trace(
-                        go.Indicator(
-                            mode="gauge+number+delta",
-                            value=max_prob * 100,
-                            domain={'x': [0, 1], 'y': [0, 1]},
-                            title={'text': "Confidence"},
-                            delta={'reference': 50},
-                            gauge={
-                                'axis': {'range': [None, 100]},
-                                'bar': {'color': colors_map.get(stress_level, '#64748b')},
-                                'steps': [
-                                    {'range': [0, 33], 'color': "lightgray"},
-                                    {'range': [33, 66], 'color': "gray"},
-                                    {'range': [66, 100], 'color': "darkgray"}
-                                ],
-                                'threshold': {
-                                    'line': {'color': "red", 'width': 4},
-                                    'thickness': 0.75,
-                                    'value': 90
-                                }
-                            }
-                        ),
-                        row=1, col=2
-                    )
-                    
-                    fig.update_layout(
-                        height=300,
-                        showlegend=False,
-                        margin=dict(l=20, r=20, t=40, b=20)
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Detailed probabilities
-                    with st.expander("📋 Detailed Probabilities"):
-                        prob_col1, prob_col2, prob_col3 = st.columns(3)
-                        for i, (level, prob) in enumerate(probabilities.items()):
-                            with [prob_col1, prob_col2, prob_col3][i]:
-                                st.metric(
-                                    level,
-                                    f"{prob*100:.1f}%",
-                                    delta=None
-                                )
-                    
-                    # Recommendations based on stress level
-                    st.markdown("---")
-                    st.markdown("#### 💡 Recommendations")
-                    
-                    if stress_level == "Low":
-                        st.success("""
-                        ✅ **Excellent financial status!**
-                        - Continue maintaining current level
-                        - Consider increasing investments
-                        - Maintain emergency fund
-                        """)
-                    elif stress_level == "Moderate":
-                        st.warning("""
-                        ⚠️ **Attention required:**
-                        - Reduce credit utilization to 30%
-                        - Create debt repayment plan
-                        - Increase savings
-                        - Consider loan consolidation
-                        """)
-                    else:
-                        st.error("""
-                        🚨 **Critical situation:**
-                        - Contact financial advisor immediately
-                        - Prioritize high-interest debt repayment
-                        - Consider debt restructuring
-                        - Create emergency action plan
-                        """)
-                
-                elif response.status_code == 503:
+                st.session_state.prediction_result = predict(
+                    tuple(sorted(payload["features"].items())), _MODEL_VERSION
+                )
+                st.session_state.last_state = state_key
+                render_prediction_panel(st.session_state.prediction_result, fresh=True)
+
+            except APIError as e:
+                if e.status_code == 503:
                     st.error("⚠️ Model not loaded. Make sure API server is running and model is available.")
                 else:
-                    st.error(f"❌ Error {response.status_code}: {response.text}")
-                    
+                    st.error(f"❌ Error {e.status_code}: {e.text}")
             except requests.exceptions.ConnectionError:
                 st.error("""
                 ❌ **Failed to connect to API**
@@ -493,33 +658,9 @@ with col2:
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
-    elif st.session_state.prediction_result:
+    elif cached_result:
         # Show cached result
-        result = st.session_state.prediction_result
-        stress_level = result.get("predicted_stress_level", "Unknown")
-        probabilities = result.get("prediction_probabilities", {})
-        
-        if stress_level == "Low":
-            color_class = "stress-low"
-            emoji = "✅"
-            title = "Low Stress Level"
-        elif stress_level == "Moderate":
-            color_class = "stress-moderate"
-            emoji = "⚠️"
-            title = "Moderate Stress Level"
-        else:
-            color_class = "stress-high"
-            emoji = "🚨"
-            title = "High Stress Level"
-        
-        st.markdown(f"""
-        <div class="result-card {color_class}">
-            <div class="result-title">{title}</div>
-            <div class="result-value">{emoji} {stress_level}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.info("💡 Click button to update prediction")
+        render_prediction_panel(cached_result, fresh=False)
     else:
         st.info("""
         👆 **Start Analysis**
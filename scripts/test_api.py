@@ -1,39 +1,62 @@
 """
 Test script for API endpoints
 """
+import io
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import time
 
 BASE_URL = "http://localhost:8080"
 
-def test_health():
+# One keep-alive connection shared by the readiness poll and all tests.
+# Transient 502/503/504 responses are retried; connection errors are not,
+# so the readiness poll keeps its own backoff
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=2, connect=0, read=0, backoff_factor=0.2,
+        status_forcelist=(502, 503, 504), allowed_methods=("GET", "POST"),
+        raise_on_status=False
+    )
+))
+SESSION.headers.update({"Content-Type": "application/json"})
+
+def _pretty(response):
+    """Pretty-print a JSON response body"""
+    return orjson.dumps(orjson.loads(response.content), option=orjson.OPT_INDENT_2).decode()
+
+def test_health(out=None):
     """Test health endpoint"""
-    print("\n=== Testing /health endpoint ===")
+    print("\n=== Testing /health endpoint ===", file=out)
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=5)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        response = SESSION.get(f"{BASE_URL}/health", timeout=(3, 5))
+        print(f"Status Code: {response.status_code}", file=out)
+        print(f"Response: {_pretty(response)}", file=out)
         return response.status_code == 200
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=out)
         return False
 
-def test_root():
+def test_root(out=None):
     """Test root endpoint"""
-    print("\n=== Testing / endpoint ===")
+    print("\n=== Testing / endpoint ===", file=out)
     try:
-        response = requests.get(BASE_URL, timeout=5)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        response = SESSION.get(BASE_URL, timeout=(3, 5))
+        print(f"Status Code: {response.status_code}", file=out)
+        print(f"Response: {_pretty(response)}", file=out)
         return response.status_code == 200
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=out)
         return False
 
-def test_predict():
+def test_predict(out=None):
     """Test single prediction endpoint"""
-    print("\n=== Testing /predict endpoint ===")
+    print("\n=== Testing /predict endpoint ===", file=out)
 
     data = {
         "features": {
@@ -61,17 +84,17 @@ def test_predict():
     }
 
     try:
-        response = requests.post(f"{BASE_URL}/predict", json=data, timeout=10)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        response = SESSION.post(f"{BASE_URL}/predict", data=orjson.dumps(data), timeout=(3, 10))
+        print(f"Status Code: {response.status_code}", file=out)
+        print(f"Response: {_pretty(response)}", file=out)
         return response.status_code == 200
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=out)
         return False
 
-def test_batch_predict():
+def test_batch_predict(out=None):
     """Test batch prediction endpoint"""
-    print("\n=== Testing /predict_batch endpoint ===")
+    print("\n=== Testing /predict_batch endpoint ===", file=out)
 
     data = {
         "workers": [
@@ -93,12 +116,12 @@ def test_batch_predict():
     }
 
     try:
-        response = requests.post(f"{BASE_URL}/predict_batch", json=data, timeout=10)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        response = SESSION.post(f"{BASE_URL}/predict_batch", data=orjson.dumps(data), timeout=(3, 10))
+        print(f"Status Code: {response.status_code}", file=out)
+        print(f"Response: {_pretty(response)}", file=out)
         return response.status_code == 200
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=out)
         return False
 
 def main():
@@ -108,30 +131,45 @@ def main():
 
     # Wait for server to be ready
     print("\nWaiting for server to be ready...")
-    max_retries = 10
+    # Exponential backoff: a server that is already up answers the first poll,
+    # while the total wait stays close to the previous ~18s budget
+    max_retries = 14
+    delay = 0.1
     for i in range(max_retries):
         try:
-            response = requests.get(f"{BASE_URL}/health", timeout=2)
+            response = SESSION.get(f"{BASE_URL}/health", timeout=1)
             if response.status_code == 200:
                 print("Server is ready!")
                 break
-        except:
+        except requests.RequestException:
             pass
 
         if i < max_retries - 1:
-            print(f"Attempt {i+1}/{max_retries} - Server not ready, waiting...")
-            time.sleep(2)
+            print(f"Attempt {i+1}/{max_retries} - Server not ready, waiting {delay:.1f}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
         else:
             print("Server did not start in time!")
             return
 
-    # Run tests
-    results = {
-        "health": test_health(),
-        "root": test_root(),
-        "predict": test_predict(),
-        "batch_predict": test_batch_predict()
+    # Run the independent tests concurrently, buffering each one's output
+    # so it is printed in order rather than interleaved
+    tests = {
+        "health": test_health,
+        "root": test_root,
+        "predict": test_predict,
+        "batch_predict": test_batch_predict
     }
+    buffers = {name: io.StringIO() for name in tests}
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        futures = {
+            name: executor.submit(test, buffers[name])
+            for name, test in tests.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    for buffer in buffers.values():
+        print(buffer.getvalue(), end="")
 
     # Summary
     print("\n" + "="*50)
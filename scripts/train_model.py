@@ -1,65 +1,266 @@
 """
 Script to train the financial stress prediction model and save artifacts
 """
+import os
+import hashlib
+from pathlib import Path
+
+# Classifier to train: 'random_forest' (default) or 'hist_gradient_boosting'
+MODEL_TYPE = os.getenv('MODEL_TYPE', 'random_forest')
+
+# The forest already runs one job per core; keep native BLAS/OpenMP pools at
+# one thread so they do not oversubscribe the CPU. HistGradientBoosting is
+# parallelised only through OpenMP, so its pool is left at the default.
+# Must be set before numpy loads
+PINNED_THREAD_VARS = ['MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+if MODEL_TYPE != 'hist_gradient_boosting':
+    PINNED_THREAD_VARS.append('OMP_NUM_THREADS')
+for var in PINNED_THREAD_VARS:
+    os.environ.setdefault(var, '1')
+
 import pandas as pd
 import numpy as np
 import joblib
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.compose import ColumnTransformer
-from sklearn.metrics import accuracy_score, f1_score
+from sklearn.metrics import f1_score
 import warnings
 warnings.filterwarnings("ignore")
 
+# Optional: compiles the credit age parser (pip install numba)
+try:
+    import numba
+except ImportError:
+    numba = None
+
 RANDOM_STATE = 2025
+# zlib level for the saved artifacts (0 = uncompressed). Compression makes the
+# file several times smaller to store and download, but the API can then no
+# longer memory-map the model arrays and loads it more slowly
+ARTIFACT_COMPRESS = int(os.getenv('ARTIFACT_COMPRESS', '0'))
+TRAIN_PATH = Path('../data/raw/train.csv')
+# Preprocessed training data is cached here between runs; set
+# PREPROCESS_CACHE=0 to always rebuild it from the raw CSV
+CACHE_DIR = Path('../data/cache')
+PREPROCESS_CACHE = os.getenv('PREPROCESS_CACHE', '1') == '1'
+# Columns of train.csv never used for training are not parsed at all
+UNUSED_COLUMNS = {'worker_id'}
+# The target has three labels, so it is loaded as a category
+TRAIN_DTYPES = {'financial_stress_level': 'category'}
+# Credit age strings look like '17 y. 11 m.'
+CREDIT_AGE_PATTERN = r'(\d+)\s*y\.\s*(\d+)\s*m\.'
+
+def _parse_credit_age_chars(chars, out):
+    """
+    Parse rows of a fixed-width uint8 character matrix into months, giving
+    the same result as searching each row for CREDIT_AGE_PATTERN: the
+    leftmost '<years> y. <months> m.' anywhere in the row, with any ASCII
+    whitespace that \\s matches around the parts. Rows without a match get NaN
+    """
+    n_rows, width = chars.shape
+    for i in range(n_rows):
+        row = chars[i]
+        out[i] = np.nan
+        for start in range(width):
+            # A match can only begin at the first digit of a run: starting
+            # later in the run leaves exactly the same text to match after it
+            if not 48 <= row[start] <= 57 or (start > 0 and 48 <= row[start - 1] <= 57):
+                continue
+            j = start
+
+            years = 0.0
+            while j < width and 48 <= row[j] <= 57:
+                years = years * 10 + (row[j] - 48)
+                j += 1
+            while j < width and (9 <= row[j] <= 13 or 28 <= row[j] <= 32):
+                j += 1
+            if j + 1 >= width or row[j] != 121 or row[j + 1] != 46:  # 'y.'
+                continue
+            j += 2
+            while j < width and (9 <= row[j] <= 13 or 28 <= row[j] <= 32):
+                j += 1
+
+            months = 0.0
+            digits = 0
+            while j < width and 48 <= row[j] <= 57:
+                months = months * 10 + (row[j] - 48)
+                j += 1
+                digits += 1
+            if digits == 0:
+                continue
+            while j < width and (9 <= row[j] <= 13 or 28 <= row[j] <= 32):
+                j += 1
+            if j + 1 >= width or row[j] != 109 or row[j + 1] != 46:  # 'm.'
+                continue
+
+            out[i] = years * 12 + months
+            break
+
+def _parse_credit_age_regex(credit_age):
+    """Convert a Series of credit age strings to months with one vectorized regex pass"""
+    parts = credit_age.str.extract(CREDIT_AGE_PATTERN)
+    return (
+        pd.to_numeric(parts[0], errors='coerce') * 12
+        + pd.to_numeric(parts[1], errors='coerce')
+    )
+
+# Edge cases the compiled parser must handle exactly like the regex
+CREDIT_AGE_PARITY_CASES = [
+    '17 y. 11 m.', '0 y. 0 m.', '17y.11m.', '  3 y. 2 m.', '3\ty. 2 m.',
+    '3 y.\n2\x0bm.', '3\x1cy. 2 m.', 'x 1 y. 2 m.', '1 y. x 2 y. 3 m.',
+    '12 y. 5 m. extra', '17 y 11 m.', '17 y. m.', 'y. 11 m.', '17 y. 11 m',
+    '17 years', '', 'nan'
+]
+
+def _compiled_parser_matches_regex():
+    """Check the compiled credit age parser against the regex on CREDIT_AGE_PARITY_CASES"""
+    cases = pd.Series(CREDIT_AGE_PARITY_CASES)
+    raw = cases.to_numpy(dtype='S')
+    months = np.empty(len(raw))
+    _parse_credit_age_chars(raw.view(np.uint8).reshape(len(raw), raw.dtype.itemsize), months)
+    return np.allclose(months, _parse_credit_age_regex(cases), equal_nan=True)
+
+if numba is not None:
+    _parse_credit_age_chars = numba.njit(cache=True)(_parse_credit_age_chars)
+    # Training must parse exactly like the API, which always uses the regex;
+    # otherwise the artifact would depend on whether numba is installed
+    if not _compiled_parser_matches_regex():
+        print("Warning: numba credit age parser disagrees with the regex, not using it")
+        numba = None
+
+def parse_credit_age(credit_age):
+    """Convert a Series of credit age strings to months (NaN if missing or malformed)"""
+    if numba is not None:
+        try:
+            # Missing values become b'nan' and fail to parse, giving NaN
+            raw = credit_age.to_numpy(dtype='S')
+        except UnicodeEncodeError:
+            # Only the regex handles non-ASCII text; it gives the same result
+            raw = None
+        if raw is not None:
+            chars = raw.view(np.uint8).reshape(len(raw), raw.dtype.itemsize)
+            months = np.empty(len(raw))
+            _parse_credit_age_chars(chars, months)
+            return pd.Series(months, index=credit_age.index)
+
+    return _parse_credit_age_regex(credit_age)
 
 def preprocess_credit_age(df):
     """Convert credit_age_months from string to numeric"""
-    df['credit_age_months_numeric'] = df['credit_age_months'].apply(
-        lambda x: int(x.replace(' y.', '').replace(' m.', '').split(' ')[0]) * 12 +
-                  int(x.replace(' y.', '').replace(' m.', '').split(' ')[1])
-        if pd.notna(x) else np.nan
-    )
+    df['credit_age_months_numeric'] = parse_credit_age(df['credit_age_months'])
     df.drop('credit_age_months', axis=1, inplace=True)
     return df
 
 def fix_negative_values(df):
     """Fix negative values in specific columns"""
-    df['num_savings_accounts'] = df['num_savings_accounts'].apply(lambda x: max(x, 0))
-    df['avg_loan_delay_days'] = df['avg_loan_delay_days'].apply(lambda x: max(x, 0))
+    cols = ['num_savings_accounts', 'avg_loan_delay_days']
+    df[cols] = df[cols].clip(lower=0)
     return df
 
 def identify_outlier_columns(df, numerical_cols, threshold=1.5):
     """Identify columns with outliers using IQR method"""
-    outlier_cols = []
-    for col in numerical_cols:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - threshold * IQR
-        upper_bound = Q3 + threshold * IQR
-        outliers_count = df[(df[col] < lower_bound) | (df[col] > upper_bound)][col].count()
-        if outliers_count > 0:
-            outlier_cols.append(col)
-    return outlier_cols
+    # Quartiles and bounds for all columns at once on the raw ndarray;
+    # NaNs are skipped and never count as outliers
+    values = df[numerical_cols].to_numpy(dtype=np.float64)
+    Q1, Q3 = np.nanpercentile(values, [25, 75], axis=0)
+    IQR = Q3 - Q1
+    lower_bound = Q1 - threshold * IQR
+    upper_bound = Q3 + threshold * IQR
+    has_outliers = ((values < lower_bound) | (values > upper_bound)).any(axis=0)
+    return [col for col, flagged in zip(numerical_cols, has_outliers) if flagged]
 
-def main():
+def train_random_forest(X, y):
+    """
+    Train the RandomForest on all rows
+
+    Each tree is validated on the rows left out of its bootstrap sample
+    (out-of-bag), which replaces a separate hold-out split and a second fit.
+
+    Returns:
+        Fitted model and dictionary of validation scores
+    """
+    print("\nTraining RandomForestClassifier on full dataset...")
+    print("Parameters: n_estimators=270, max_depth=35")
+
+    clf = RandomForestClassifier(
+        n_estimators=270,
+        max_depth=35,
+        class_weight=None,
+        bootstrap=True,
+        oob_score=True,
+        random_state=RANDOM_STATE,
+        n_jobs=-1
+    )
+    clf.fit(X, y)
+
+    y_oob_pred = clf.oob_decision_function_.argmax(axis=1)
+    scores = {
+        'Accuracy (out-of-bag)': clf.oob_score_,
+        'F1-score (weighted, out-of-bag)': f1_score(y, y_oob_pred, average='weighted')
+    }
+    return clf, scores
+
+def train_hist_gradient_boosting(X, y):
+    """
+    Train a HistGradientBoosting model on all rows
+
+    Features are binned to uint8 once, so fitting is much faster and lighter
+    than growing 270 deep trees. Early stopping holds out 10% of the rows,
+    and the final score on them is reported.
+
+    Returns:
+        Fitted model and dictionary of validation scores
+    """
+    print("\nTraining HistGradientBoostingClassifier on full dataset...")
+    print("Parameters: max_iter=400, learning_rate=0.05, early_stopping=True")
+
+    clf = HistGradientBoostingClassifier(
+        max_iter=400,
+        learning_rate=0.05,
+        early_stopping=True,
+        scoring='accuracy',
+        random_state=RANDOM_STATE
+    )
+    clf.fit(X, y)
+
+    scores = {'Accuracy (early-stopping hold-out)': clf.validation_score_[-1]}
+    return clf, scores
+
+def prepare_training_data():
+    """
+    Load train.csv, clean it and fit the preprocessor on all rows
+
+    Returns:
+        Dictionary with the processed feature matrix and encoded target, the
+        fitted preprocessor and label encoder, and the imputation statistics
+    """
     print("Loading training data...")
-    train_df = pd.read_csv('../data/raw/train.csv').drop('Unnamed: 0', axis=1)
+    # The unnamed first column is the row index
+    train_df = pd.read_csv(
+        TRAIN_PATH,
+        index_col=0,
+        usecols=lambda col: col not in UNUSED_COLUMNS,
+        dtype=TRAIN_DTYPES
+    )
 
     print(f"Training data shape: {train_df.shape}")
     print(f"Target distribution:\n{train_df['financial_stress_level'].value_counts()}")
 
+    # Split off the target right away so the cleaning, dtype scans and
+    # statistics below only ever touch feature columns (worker_id is never
+    # loaded, see UNUSED_COLUMNS)
+    y = train_df.pop('financial_stress_level')
+
     # Preprocessing
     print("\nPreprocessing data...")
     train_df = preprocess_credit_age(train_df)
     train_df = fix_negative_values(train_df)
 
-    # Identify numerical and categorical columns
+    # Identify numerical and categorical columns once; they are also the
+    # model's feature lists
     numerical_cols = train_df.select_dtypes(include=np.number).columns.tolist()
-    object_cols = train_df.select_dtypes(include='object').columns
-    categorical_cols = object_cols.drop(['worker_id', 'financial_stress_level'], errors='ignore').tolist()
+    categorical_cols = train_df.select_dtypes(include='object').columns.tolist()
 
     # Identify outlier columns
     numerical_cols_outliers = identify_outlier_columns(train_df, numerical_cols)
@@ -69,109 +270,141 @@ def main():
     train_medians = train_df[numerical_cols].median().to_dict()
     train_means = train_df[numerical_cols].mean().to_dict()
 
-    # Fill missing values
+    # Fill missing values using the statistics computed above
     print("Filling missing values...")
-    for col in numerical_cols:
-        if col in numerical_cols_outliers:
-            train_df[col].fillna(train_df[col].median(), inplace=True)
-        else:
-            train_df[col].fillna(train_df[col].mean(), inplace=True)
+    outlier_set = set(numerical_cols_outliers)
+    fill_vec = np.array([
+        train_medians[col] if col in outlier_set else train_means[col]
+        for col in numerical_cols
+    ])
+    # Numerical block: one NumPy fill with each NaN taking its column's value,
+    # written back as float32 (the precision the trees split on anyway) so the
+    # fill and the downcast share a single copy. Statistics above stay float64
+    values = train_df[numerical_cols].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    values[missing] = np.take(fill_vec, np.nonzero(missing)[1])
+    train_df[numerical_cols] = values.astype(np.float32)
 
-    for col in categorical_cols:
-        train_df[col].fillna('Unknown', inplace=True)
+    # Categorical block: strings become categories once 'Unknown' is filled in,
+    # as a categorical column cannot take a new level through fillna
+    train_df[categorical_cols] = train_df[categorical_cols].fillna('Unknown').astype('category')
 
-    # Prepare features and target
-    X = train_df.drop(['financial_stress_level', 'worker_id'], axis=1)
-    y = train_df['financial_stress_level']
+    # The cleaned frame now holds exactly the features
+    X = train_df
 
-    # Encode target
+    # Encode target once; the fitted encoder is saved for decoding predictions
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
 
-    # Split for validation
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=RANDOM_STATE, stratify=y_encoded
-    )
-
     # Get feature columns for preprocessing
-    numerical_features = X.select_dtypes(include=np.number).columns.tolist()
-    categorical_features = X.select_dtypes(include='object').columns.tolist()
+    numerical_features = numerical_cols
+    categorical_features = categorical_cols
 
-    # Create preprocessor
+    # Create preprocessor and fit it once on all rows. HistGradientBoosting
+    # only accepts dense input, so its preprocessor never returns sparse output.
+    # For the forest the default threshold also yields a dense matrix here:
+    # about half of its entries are non-zero, and trees fit far slower on CSR
     print("Creating preprocessor...")
+    # The category dtype already holds each column's sorted levels, which are
+    # exactly what the encoder would find, so it skips its own unique scan
+    categories = [X[col].cat.categories.tolist() for col in categorical_features]
     preprocessor = ColumnTransformer(
         transformers=[
             ('num', StandardScaler(), numerical_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore', drop='first'), categorical_features)
-        ]
+            (
+                'cat',
+                OneHotEncoder(categories=categories, handle_unknown='ignore', drop='first'),
+                categorical_features
+            )
+        ],
+        sparse_threshold=0 if MODEL_TYPE == 'hist_gradient_boosting' else 0.3
     )
+    X_full_processed = preprocessor.fit_transform(X)
 
-    # Fit preprocessor on training data
-    X_train_processed = preprocessor.fit_transform(X_train)
-    X_val_processed = preprocessor.transform(X_val)
+    return {
+        'X_full_processed': X_full_processed,
+        'y_encoded': y_encoded,
+        'preprocessor': preprocessor,
+        'label_encoder': label_encoder,
+        'train_medians': train_medians,
+        'train_means': train_means,
+        'numerical_cols_outliers': numerical_cols_outliers,
+        'numerical_features': numerical_features,
+        'categorical_features': categorical_features,
+        'feature_names': X.columns.tolist()
+    }
 
-    # Train model
-    print("\nTraining RandomForestClassifier...")
-    print("Parameters: n_estimators=270, max_depth=35")
+def _cache_path():
+    """
+    Path of the cached preprocessing output for the current train.csv
 
-    clf = RandomForestClassifier(
-        n_estimators=270,
-        max_depth=35,
-        class_weight=None,
-        random_state=RANDOM_STATE,
-        n_jobs=-1
-    )
-    clf.fit(X_train_processed, y_train)
+    The key covers the CSV contents, this script (which defines the
+    preprocessing) and MODEL_TYPE (which decides sparse or dense output), so
+    any change to them misses the cache instead of reusing stale data.
+    """
+    digest = hashlib.sha256()
+    with open(TRAIN_PATH, 'rb') as f:
+        digest.update(hashlib.file_digest(f, 'sha256').digest())
+    digest.update(Path(__file__).read_bytes())
+    digest.update(MODEL_TYPE.encode())
+    return CACHE_DIR / f"preprocessed_{digest.hexdigest()[:16]}.joblib"
 
-    # Validate
-    y_pred = clf.predict(X_val_processed)
-    accuracy = accuracy_score(y_val, y_pred)
-    f1 = f1_score(y_val, y_pred, average='weighted')
+def load_training_data():
+    """
+    Return the output of prepare_training_data, reusing the cached copy
+    from an earlier run on the same data when PREPROCESS_CACHE is enabled
 
-    print(f"\nValidation Results:")
-    print(f"Accuracy: {accuracy:.4f}")
-    print(f"F1-score (weighted): {f1:.4f}")
+    Returns:
+        Dictionary as returned by prepare_training_data
+    """
+    if not PREPROCESS_CACHE:
+        return prepare_training_data()
 
-    # Train on full dataset
-    print("\nTraining on full dataset...")
-    X_full = train_df.drop(['financial_stress_level', 'worker_id'], axis=1)
-    y_full = train_df['financial_stress_level']
-    y_full_encoded = label_encoder.fit_transform(y_full)
+    cache_path = _cache_path()
+    if cache_path.exists():
+        try:
+            # Memory-map the feature matrix instead of reading it into memory
+            data = joblib.load(cache_path, mmap_mode='r')
+            print(f"Loaded preprocessed training data from {cache_path}")
+            return data
+        except Exception as e:
+            print(f"Ignoring unreadable cache {cache_path}: {e}")
 
-    preprocessor_full = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numerical_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore', drop='first'), categorical_features)
-        ]
-    )
+    data = prepare_training_data()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Write under a temporary name so an interrupted run leaves no partial cache
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    joblib.dump(data, tmp_path, protocol=5)
+    tmp_path.replace(cache_path)
+    return data
 
-    X_full_processed = preprocessor_full.fit_transform(X_full)
+def main():
+    data = load_training_data()
+    X_full_processed = data['X_full_processed']
+    y_encoded = data['y_encoded']
 
-    clf_full = RandomForestClassifier(
-        n_estimators=270,
-        max_depth=35,
-        class_weight=None,
-        random_state=RANDOM_STATE,
-        n_jobs=-1
-    )
-    clf_full.fit(X_full_processed, y_full_encoded)
+    # Train a single model on the full dataset
+    if MODEL_TYPE == 'hist_gradient_boosting':
+        clf_full, scores = train_hist_gradient_boosting(X_full_processed, y_encoded)
+    else:
+        clf_full, scores = train_random_forest(X_full_processed, y_encoded)
+
+    print(f"\nValidation Results:")
+    for name, score in scores.items():
+        print(f"{name}: {score:.4f}")
 
     # Save artifacts
     print("\nSaving model artifacts...")
 
-    artifacts = {
-        'model': clf_full,
-        'preprocessor': preprocessor_full,
-        'label_encoder': label_encoder,
-        'train_medians': train_medians,
-        'train_means': train_means,
-        'numerical_cols_outliers': numerical_cols_outliers,
-        'numerical_features': numerical_features,
-        'categorical_features': categorical_features,
-        'feature_names': X_full.columns.tolist()
-    }
+    artifacts = {'model': clf_full}
+    artifacts.update(
+        (key, value) for key, value in data.items()
+        if key not in ('X_full_processed', 'y_encoded')
+    )
 
-    joblib.dump(artifacts, '../models/model_artifacts.joblib')
+    joblib.dump(
+        artifacts, '../models/model_artifacts.joblib', compress=ARTIFACT_COMPRESS, protocol=5
+    )
     print("Model artifacts saved to ../models/model_artifacts.joblib")
 
     print("\nTraining completed successfully!")